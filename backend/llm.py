@@ -1,58 +1,232 @@
 """
 LLM integration using You.com Search API for intelligent incident analysis.
 """
+import asyncio
+import copy
 import os
 import re
-from typing import List
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import httpx
+import orjson
+
+try:
+    import re2  # RE2's linear-time DFA matcher
+except ImportError:
+    re2 = None
 
 # API Configuration
 YOU_API_KEY = os.getenv("YOU_API_KEY", "ydc-sk-5ea85544c02a05f9-GJov23rQ0SbPwYTZ4G19krtAkJRMmFVG-8047ba4b")
 YOU_SEARCH_URL = "https://ydc-index.io/v1/search"
 
+# Pooled client shared by all outbound calls, opened by the app lifespan
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Cap on concurrent You.com requests to stay within rate limits
+_SEARCH_CONCURRENCY = 4
+_search_semaphore: Optional[asyncio.Semaphore] = None
+
+# Search results per query, kept for a day: query -> (expires_at, results)
+_SEARCH_CACHE_SIZE = 1024
+_SEARCH_CACHE_TTL = 24 * 60 * 60
+_search_cache = OrderedDict()
+
+
+# You.com search terms per error signature, in priority order
+_SEARCH_TERMS = (
+    ('oom', 'OOMKilled kubernetes memory limit'),
+    ('econn', 'ECONNREFUSED connection refused fix'),
+    ('timeout', 'request timeout troubleshooting'),
+    ('permission', 'permission denied kubernetes RBAC'),
+    ('crash', 'application crash debug'),
+    ('disk', 'disk space full kubernetes'),
+    ('crashloop', 'CrashLoopBackOff kubernetes debug'),
+    ('imagepull', 'ImagePullBackOff kubernetes fix'),
+)
+
+# Error signature patterns. Each is searched on its own and skipped once
+# found, so a log pays at most one scan per signature no matter how often a
+# signature repeats, and overlapping signatures ("timeout of memory") are
+# all seen.
+_SIGNATURE_SOURCES = (
+    ('oom', r'oomkilled|out of memory'),
+    ('econn', r'econnrefused|connection refused'),
+    ('timeout', r'timeout'),
+    ('permission', r'permission denied|403|401'),
+    ('crash', r'crash|segfault'),
+    ('disk', r'disk|storage|no space'),
+    ('crashloop', r'crashloopbackoff'),
+    ('imagepull', r'imagepullbackoff'),
+)
+# Prefer RE2 when installed. It matches UTF-8 bytes case-insensitively at
+# full speed, so each window is encoded once for all of its searches.
+# re loses its fast literal scan under IGNORECASE, so without RE2 each
+# window is lowercased once and matched case-sensitively instead.
+if re2 is not None:
+    _SIGNATURE_PATTERNS = tuple(
+        (name, re2.compile(('(?i)' + source).encode())) for name, source in _SIGNATURE_SOURCES
+    )
+else:
+    _SIGNATURE_PATTERNS = tuple(
+        (name, re.compile(source)) for name, source in _SIGNATURE_SOURCES
+    )
+
+# Only the head and tail of large log dumps are scanned for signatures
+_SCAN_HEAD = 4096
+_SCAN_TAIL = 16384
+
+# Pattern analysis responses per signature, in priority order
+_ANALYSIS_TEMPLATES = {
+    'oom': {
+        "suspected_root_causes": ["Memory limit exceeded", "Memory leak in application"],
+        "suggested_fix": "Increase memory limits or investigate memory leaks",
+        "confidence": "high",
+    },
+    'econn': {
+        "suspected_root_causes": ["Target service is down", "Network policy blocking"],
+        "suggested_fix": "Check if target service is running",
+        "confidence": "high",
+    },
+    'timeout': {
+        "suspected_root_causes": ["Slow downstream service", "Network latency"],
+        "suggested_fix": "Increase timeout or investigate slow services",
+        "confidence": "medium",
+    },
+    'crashloop': {
+        "suspected_root_causes": ["Application failing to start", "Configuration error"],
+        "suggested_fix": "Check pod logs with kubectl logs",
+        "confidence": "high",
+    },
+    'imagepull': {
+        "suspected_root_causes": ["Invalid image name", "Missing credentials"],
+        "suggested_fix": "Verify image name and imagePullSecrets",
+        "confidence": "high",
+    },
+}
+_UNKNOWN_TEMPLATE = {
+    "suspected_root_causes": ["Unknown error", "Requires investigation"],
+    "suggested_fix": "Review full logs",
+    "confidence": "low",
+}
+
+
+# Recent analyses keyed by the signatures found and the incident context:
+# key -> (expires_at, analysis). They embed search results, so they expire
+# with them.
+_ANALYSIS_CACHE_SIZE = 256
+_analysis_cache = OrderedDict()
+
+
+def analysis_cache_key(
+    logs: str,
+    similar_incidents: List[dict],
+    found: Optional[set] = None
+) -> tuple:
+    """Key analyze_incident on exactly the inputs that decide its result.
 
-def extract_error_keywords(logs: str) -> List[str]:
-    """Extract key error terms from logs for searching."""
-    keywords = []
-    logs_lower = logs.lower()
-
-    patterns = [
-        (r'oomkilled|out of memory', 'OOMKilled kubernetes memory limit'),
-        (r'econnrefused|connection refused', 'ECONNREFUSED connection refused fix'),
-        (r'timeout', 'request timeout troubleshooting'),
-        (r'permission denied|403|401', 'permission denied kubernetes RBAC'),
-        (r'crash|segfault', 'application crash debug'),
-        (r'disk|storage|no space', 'disk space full kubernetes'),
-        (r'crashloopbackoff', 'CrashLoopBackOff kubernetes debug'),
-        (r'imagepullbackoff', 'ImagePullBackOff kubernetes fix'),
-    ]
-
-    for pattern, search_term in patterns:
-        if re.search(pattern, logs_lower):
-            keywords.append(search_term)
+    The logs only matter through the signatures they match, which pick both
+    the You.com search terms and the pattern analysis. Attempted fixes don't
+    matter at all, so a follow-up on unchanged logs is a hit.
+    """
+    return (
+        frozenset(match_error_signatures(logs) if found is None else found),
+        tuple(
+            (s.get("id"), s.get("updated_at"), s.get("resolution_notes"))
+            for s in similar_incidents
+        ),
+    )
+
+
+def _scan_windows(logs: str) -> tuple:
+    """Return the head and tail of large logs, where error signatures appear."""
+    if len(logs) <= _SCAN_HEAD + _SCAN_TAIL:
+        return (logs,)
+    return (logs[:_SCAN_HEAD], logs[-_SCAN_TAIL:])
+
+
+def match_error_signatures(logs: str) -> set:
+    """Return the names of all error signatures found in the logs."""
+    found = set()
 
+    for window in _scan_windows(logs):
+        window = window.encode() if re2 is not None else window.lower()
+
+        for name, pattern in _SIGNATURE_PATTERNS:
+            if name not in found and pattern.search(window):
+                found.add(name)
+
+    return found
+
+
+def extract_error_keywords(logs: str, found: Optional[set] = None) -> List[str]:
+    """Extract key error terms from logs for searching."""
+    if found is None:
+        found = match_error_signatures(logs)
+    keywords = [term for name, term in _SEARCH_TERMS if name in found]
     return keywords[:2]
 
 
+def open_http_client() -> httpx.AsyncClient:
+    """Create the shared HTTP client and search semaphore if not already open.
+
+    Both bind to the running event loop, so close_http_client drops them
+    and a restarted app gets fresh ones.
+    """
+    global _http_client, _search_semaphore
+    if _search_semaphore is None:
+        _search_semaphore = asyncio.Semaphore(_SEARCH_CONCURRENCY)
+    if _http_client is None or _http_client.is_closed:
+        # HTTP/2 multiplexes concurrent searches over one TLS connection
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and its pooled connections."""
+    global _http_client, _search_semaphore
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _search_semaphore = None
+
+
 async def search_you_com(query: str) -> dict:
     """Search You.com for relevant information."""
-    import httpx
-
     if not YOU_API_KEY:
         return {"results": {}}
 
+    cached = _search_cache.get(query)
+    if cached and cached[0] > time.monotonic():
+        _search_cache.move_to_end(query)
+        return cached[1]
+
+    client = open_http_client()
+
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with _search_semaphore:
             response = await client.get(
                 YOU_SEARCH_URL,
                 headers={"X-API-Key": YOU_API_KEY},
                 params={"query": query}
             )
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        results = orjson.loads(response.content)
     except Exception as e:
         print(f"You.com Search error: {e}")
         return {"results": {}}
 
+    _search_cache[query] = (time.monotonic() + _SEARCH_CACHE_TTL, results)
+    _search_cache.move_to_end(query)
+    if len(_search_cache) > _SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+    return results
+
 
 def extract_insights_from_search(search_results: dict) -> dict:
     """Extract actionable insights from You.com search results."""
@@ -88,19 +262,41 @@ async def analyze_incident(
     similar_incidents = similar_incidents or []
     attempted_fixes = attempted_fixes or []
 
+    # One scan of the logs feeds the cache key, the searches and the analysis
+    found = match_error_signatures(logs)
+    cache_key = analysis_cache_key(logs, similar_incidents, found)
+    cached = _analysis_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        _analysis_cache.move_to_end(cache_key)
+        return copy.deepcopy(cached[1])
+
     # Step 1: Search You.com for context
     search_insights = {"snippets": [], "sources": []}
-    keywords = extract_error_keywords(logs)
-
-    if YOU_API_KEY and keywords:
-        for keyword in keywords[:1]:  # Just one search to keep it fast
-            results = await search_you_com(keyword)
+    keywords = extract_error_keywords(logs, found)
+    searched = bool(YOU_API_KEY and keywords)
+
+    if searched:
+        # Searches run concurrently, so latency is the slowest one, not the sum
+        results_list = await asyncio.gather(
+            *(search_you_com(keyword) for keyword in keywords[:2]),
+            return_exceptions=True
+        )
+        for results in results_list:
+            if isinstance(results, BaseException):
+                continue
             new_insights = extract_insights_from_search(results)
             search_insights["snippets"].extend(new_insights["snippets"])
             search_insights["sources"].extend(new_insights["sources"])
 
+        # Both searches can surface the same page; keep first-seen order
+        search_insights["snippets"] = list(dict.fromkeys(search_insights["snippets"]))
+        unique_sources = {}
+        for source in search_insights["sources"]:
+            unique_sources.setdefault(source["url"], source)
+        search_insights["sources"] = list(unique_sources.values())
+
     # Step 2: Pattern-based analysis
-    analysis = generate_pattern_analysis(logs, similar_incidents, attempted_fixes)
+    analysis = generate_pattern_analysis(logs, similar_incidents, attempted_fixes, found)
 
     # Step 3: Enhance with search results
     if search_insights["snippets"]:
@@ -109,59 +305,46 @@ async def analyze_incident(
         analysis["web_sources"] = search_insights["sources"][:3]
 
     analysis["powered_by"] = "You.com Search API" if YOU_API_KEY else "Pattern matching"
+
+    # A failed search leaves nothing worth reusing
+    if search_insights["snippets"] or not searched:
+        expires_at = time.monotonic() + _SEARCH_CACHE_TTL
+        _analysis_cache[cache_key] = (expires_at, copy.deepcopy(analysis))
+        _analysis_cache.move_to_end(cache_key)
+        if len(_analysis_cache) > _ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+
     return analysis
 
 
 def generate_pattern_analysis(
     logs: str,
     similar_incidents: List[dict] = None,
-    attempted_fixes: List[dict] = None
+    attempted_fixes: List[dict] = None,
+    found: Optional[set] = None
 ) -> dict:
     """Generate analysis using pattern matching."""
     similar_incidents = similar_incidents or []
     attempted_fixes = attempted_fixes or []
-    logs_lower = logs.lower()
-
-    if "oomkilled" in logs_lower or "out of memory" in logs_lower:
-        causes = ["Memory limit exceeded", "Memory leak in application"]
-        fix = "Increase memory limits or investigate memory leaks"
-        confidence = "high"
-    elif "connection refused" in logs_lower or "econnrefused" in logs_lower:
-        causes = ["Target service is down", "Network policy blocking"]
-        fix = "Check if target service is running"
-        confidence = "high"
-    elif "timeout" in logs_lower:
-        causes = ["Slow downstream service", "Network latency"]
-        fix = "Increase timeout or investigate slow services"
-        confidence = "medium"
-    elif "crashloopbackoff" in logs_lower:
-        causes = ["Application failing to start", "Configuration error"]
-        fix = "Check pod logs with kubectl logs"
-        confidence = "high"
-    elif "imagepullbackoff" in logs_lower:
-        causes = ["Invalid image name", "Missing credentials"]
-        fix = "Verify image name and imagePullSecrets"
-        confidence = "high"
-    else:
-        causes = ["Unknown error", "Requires investigation"]
-        fix = "Review full logs"
-        confidence = "low"
+    if found is None:
+        found = match_error_signatures(logs)
+
+    template = next(
+        (t for name, t in _ANALYSIS_TEMPLATES.items() if name in found),
+        _UNKNOWN_TEMPLATE
+    )
+    result = template.copy()
+    result["suspected_root_causes"] = list(template["suspected_root_causes"])
 
     # Add context from similar incidents
     if similar_incidents:
         for inc in similar_incidents[:1]:
             if inc.get("resolution_notes"):
-                fix = f"{fix}. Past fix: {inc['resolution_notes']}"
-
-    explanation = f"Pattern analysis. Found {len(similar_incidents)} similar incidents."
+                result["suggested_fix"] += ". Past fix: " + inc["resolution_notes"]
 
-    return {
-        "suspected_root_causes": causes,
-        "suggested_fix": fix,
-        "confidence": confidence,
-        "explanation": explanation,
-        "web_sources": []
-    }
+    result["explanation"] = "Pattern analysis. Found " + str(len(similar_incidents)) + " similar incidents."
+    result["web_sources"] = []
+    return result
 
 
 async def evaluate_after_fix(incident: dict, new_logs: str = "") -> dict:
@@ -2,6 +2,7 @@
 Autonomous Incident Analyst - FastAPI Backend
 Stateful AI agent for log analysis and incident resolution.
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -9,10 +10,20 @@ from typing import Optional, List
 import memory
 import llm
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one pooled HTTP client and search semaphore across requests."""
+    llm.open_http_client()
+    yield
+    await llm.close_http_client()
+
+
 app = FastAPI(
     title="Autonomous Incident Analyst",
     description="Stateful AI agent for incident analysis and resolution",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS for frontend
@@ -205,9 +216,7 @@ async def resolve_incident(request: ResolveRequest):
 @app.delete("/incidents/{incident_id}")
 async def delete_incident(incident_id: int):
     """Delete an incident (for testing/cleanup)."""
-    incidents = memory.load_incidents()
-    incidents = [i for i in incidents if i["id"] != incident_id]
-    memory.save_incidents(incidents)
+    memory.delete_incident(incident_id)
     return {"message": f"Incident {incident_id} deleted"}
 
 
@@ -1,61 +1,288 @@
 """
 Incident memory storage and retrieval.
-Simulates RAG behavior with simple string similarity matching.
+Incidents live in SQLite; incidents.json seeds a fresh database.
+Simulates RAG behavior with TF-IDF cosine similarity over log tokens.
 """
-import json
+import copy
+import heapq
+import math
 import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
 from datetime import datetime
 from typing import List, Optional
-from difflib import SequenceMatcher
 
-MEMORY_FILE = "incidents.json"
+import orjson
 
+MEMORY_FILE = "incidents.json"  # Seed data imported into a new database
+DATABASE_FILE = "incidents.db"
 
-def load_incidents() -> List[dict]:
-    """Load all incidents from memory file."""
+_COLUMNS = (
+    "id",
+    "logs",
+    "metrics",
+    "suspected_root_causes",
+    "attempted_fixes",
+    "status",
+    "created_at",
+    "updated_at",
+    "resolution_notes",
+)
+_JSON_COLUMNS = ("suspected_root_causes", "attempted_fixes")
+# Log token counts are derived once at ingest and kept out of incident dicts
+_STORED_COLUMNS = _COLUMNS + ("token_counts",)
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    logs TEXT NOT NULL,
+    metrics TEXT NOT NULL DEFAULT '',
+    suspected_root_causes TEXT NOT NULL DEFAULT '[]',
+    attempted_fixes TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'open',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    resolution_notes TEXT NOT NULL DEFAULT '',
+    token_counts TEXT NOT NULL DEFAULT '{}'
+)
+"""
+_SELECT = f"SELECT {', '.join(_STORED_COLUMNS)} FROM incidents"
+_INSERT = (
+    f"INSERT INTO incidents ({', '.join(_STORED_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_STORED_COLUMNS))})"
+)
+_UPDATE = f"UPDATE incidents SET {', '.join(c + ' = ?' for c in _STORED_COLUMNS[1:])} WHERE id = ?"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Similarity only looks at the log tail, where the error frames are
+SIMILARITY_WINDOW = 4096
+
+_connection = None
+_db_lock = threading.RLock()
+
+# All incidents, reused until another connection commits a change.
+# "index" maps incident id -> position in "data"; "tokens" maps incident
+# id -> stored log token counts.
+_cache = {"version": None, "data": None, "index": None, "tokens": None}
+
+# TF-IDF index over resolved incidents, rebuilt lazily after each change
+_similarity_index = None
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the incident database, creating and seeding it on first use."""
+    global _connection
+    if _connection is None:
+        conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute(_SCHEMA)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version == 0:
+                _import_seed(conn)
+            elif version == 1:
+                _add_token_counts(conn)
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        _connection = conn
+    return _connection
+
+
+def _import_seed(conn: sqlite3.Connection) -> None:
+    """Copy the incidents from the JSON memory file into the database."""
     if not os.path.exists(MEMORY_FILE):
-        return []
-    with open(MEMORY_FILE, "r") as f:
-        return json.load(f)
+        return
+    with open(MEMORY_FILE, "rb") as f:
+        incidents = orjson.loads(f.read())
+    conn.executemany(_INSERT, [
+        _to_row(_fill_defaults(incident), log_token_counts(incident["logs"]))
+        for incident in incidents
+    ])
+
+
+def _add_token_counts(conn: sqlite3.Connection) -> None:
+    """Add and backfill the token_counts column on a version 1 database."""
+    conn.execute("ALTER TABLE incidents ADD COLUMN token_counts TEXT NOT NULL DEFAULT '{}'")
+    rows = conn.execute("SELECT id, logs FROM incidents").fetchall()
+    conn.executemany("UPDATE incidents SET token_counts = ? WHERE id = ?", [
+        (orjson.dumps(log_token_counts(logs)).decode(), incident_id)
+        for incident_id, logs in rows
+    ])
+
+
+def _fill_defaults(incident: dict) -> dict:
+    """Replace missing or null fields with the column defaults, in place.
+
+    Columns are NOT NULL, but clients may send null metrics or notes. Doing
+    this on the dict keeps the cache and API responses in line with the row.
+    """
+    for column in _COLUMNS[1:]:
+        if incident.get(column) is None:
+            incident[column] = [] if column in _JSON_COLUMNS else ""
+    return incident
+
+
+def _to_row(incident: dict, token_counts: dict) -> tuple:
+    """Convert an incident dict and its token counts to a row in column order."""
+    values = tuple(
+        orjson.dumps(incident[column]).decode() if column in _JSON_COLUMNS
+        else incident.get(column)
+        for column in _COLUMNS
+    )
+    return values + (orjson.dumps(token_counts).decode(),)
+
+
+def _from_row(row: tuple) -> tuple:
+    """Convert a database row to an incident dict and its token counts."""
+    incident = dict(zip(_COLUMNS, row))
+    for column in _JSON_COLUMNS:
+        incident[column] = orjson.loads(incident[column])
+    return incident, orjson.loads(row[-1])
+
+
+def _reindex_cache() -> None:
+    """Rebuild the id -> position lookup for the cached incidents."""
+    _cache["index"] = {incident["id"]: i for i, incident in enumerate(_cache["data"])}
+
+
+def load_incidents() -> List[dict]:
+    """Load all incidents from the database."""
+    with _db_lock:
+        conn = _connect()
+        # data_version only moves when another connection commits
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+
+        if _cache["data"] is None or _cache["version"] != version:
+            rows = conn.execute(f"{_SELECT} ORDER BY id").fetchall()
+            _cache["data"] = []
+            _cache["tokens"] = {}
+            for row in rows:
+                incident, token_counts = _from_row(row)
+                _cache["data"].append(incident)
+                _cache["tokens"][incident["id"]] = token_counts
+            _cache["version"] = version
+            _reindex_cache()
+            invalidate_similarity_index()
+
+        return _cache["data"]
+
+
+def canonical_logs(logs: str) -> str:
+    """Trim logs to the tail used for similarity comparison."""
+    return logs[-SIMILARITY_WINDOW:]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return _TOKEN_PATTERN.findall(text.lower())
 
 
-def save_incidents(incidents: List[dict]) -> None:
-    """Save incidents to memory file."""
-    with open(MEMORY_FILE, "w") as f:
-        json.dump(incidents, f, indent=2, default=str)
+def log_token_counts(logs: str) -> dict:
+    """Count the tokens in the log tail used for similarity."""
+    return dict(Counter(tokenize(canonical_logs(logs))))
+
+
+def _normalize(weights: dict) -> dict:
+    """Scale a sparse vector to unit length."""
+    norm = math.hypot(*weights.values())
+    if not norm:
+        return {}
+    return {term: w / norm for term, w in weights.items()}
+
+
+def _cosine(vec1: dict, vec2: dict) -> float:
+    """Dot product of two unit-length sparse vectors."""
+    if len(vec1) > len(vec2):
+        vec1, vec2 = vec2, vec1
+    return sum(w * vec2.get(term, 0.0) for term, w in vec1.items())
 
 
 def calculate_similarity(text1: str, text2: str) -> float:
-    """Calculate string similarity between two texts."""
-    return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+    """Calculate cosine similarity between the token counts of two log tails."""
+    vec1 = _normalize(log_token_counts(text1))
+    vec2 = _normalize(log_token_counts(text2))
+    return _cosine(vec1, vec2)
 
 
-def find_similar_incidents(logs: str, top_k: int = 3) -> List[dict]:
-    """Find similar past incidents based on log content."""
-    incidents = load_incidents()
+def build_similarity_index(incidents: List[dict], token_counts: dict) -> dict:
+    """Build a TF-IDF index over the resolved incidents.
+
+    token_counts maps incident id -> the log token counts stored at ingest.
+    """
     resolved_incidents = [i for i in incidents if i.get("status") == "resolved"]
+    token_counts = [token_counts[i["id"]] for i in resolved_incidents]
+
+    doc_freq = Counter()
+    for counts in token_counts:
+        doc_freq.update(counts.keys())
+
+    # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+    total = len(resolved_incidents)
+    idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in doc_freq.items()}
 
-    if not resolved_incidents:
+    # Inverted index: term -> [(position in resolved_incidents, weight)]
+    postings = defaultdict(list)
+    for position, counts in enumerate(token_counts):
+        vector = _normalize({term: count * idf[term] for term, count in counts.items()})
+        for term, weight in vector.items():
+            postings[term].append((position, weight))
+
+    return {"idf": idf, "incidents": resolved_incidents, "postings": postings}
+
+
+def get_similarity_index() -> dict:
+    """Return the cached similarity index, building it if needed."""
+    global _similarity_index
+    with _db_lock:
+        incidents = load_incidents()  # Drops the index if the data changed
+        if _similarity_index is None:
+            _similarity_index = build_similarity_index(incidents, _cache["tokens"])
+        return _similarity_index
+
+
+def invalidate_similarity_index() -> None:
+    """Drop the cached similarity index so the next query rebuilds it."""
+    global _similarity_index
+    _similarity_index = None
+
+
+def find_similar_incidents(logs: str, top_k: int = 3) -> List[dict]:
+    """Find similar past incidents based on log content."""
+    index = get_similarity_index()
+    if not index["incidents"]:
         return []
 
-    # Calculate similarity scores
-    scored = []
-    for incident in resolved_incidents:
-        similarity = calculate_similarity(logs, incident.get("logs", ""))
-        if similarity > 0.1:  # Minimum threshold
-            scored.append((similarity, incident))
+    # Terms never seen in resolved incidents carry no weight
+    idf = index["idf"]
+    query = _normalize({
+        term: count * idf[term]
+        for term, count in log_token_counts(logs).items()
+        if term in idf
+    })
+
+    # Accumulate cosine scores only for incidents sharing a query term
+    scores = defaultdict(float)
+    postings = index["postings"]
+    for term, query_weight in query.items():
+        for position, weight in postings[term]:
+            scores[position] += query_weight * weight
+
+    scored = [(similarity, position) for position, similarity in scores.items()
+              if similarity > 0.1]  # Minimum threshold
 
-    # Sort by similarity and return top_k
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [incident for _, incident in scored[:top_k]]
+    # Return the top_k most similar
+    top = heapq.nlargest(top_k, scored)
+    return [index["incidents"][position] for _, position in top]
 
 
 def create_incident(logs: str, metrics: str = "") -> dict:
     """Create a new incident."""
-    incidents = load_incidents()
-
     incident = {
-        "id": len(incidents) + 1,
+        "id": None,
         "logs": logs,
         "metrics": metrics,
         "suspected_root_causes": [],
@@ -65,46 +292,71 @@ def create_incident(logs: str, metrics: str = "") -> dict:
         "updated_at": datetime.now().isoformat(),
         "resolution_notes": ""
     }
+    _fill_defaults(incident)
+
+    token_counts = log_token_counts(logs)
 
-    incidents.append(incident)
-    save_incidents(incidents)
+    with _db_lock:
+        conn = _connect()
+        with conn:
+            cursor = conn.execute(_INSERT, _to_row(incident, token_counts))
+        incident["id"] = cursor.lastrowid
+
+        # New incidents are open, so the similarity index is unaffected
+        if _cache["data"] is not None:
+            _cache["index"][incident["id"]] = len(_cache["data"])
+            _cache["data"].append(copy.deepcopy(incident))
+            _cache["tokens"][incident["id"]] = token_counts
     return incident
 
 
 def get_incident(incident_id: int) -> Optional[dict]:
     """Get incident by ID."""
-    incidents = load_incidents()
-    for incident in incidents:
-        if incident["id"] == incident_id:
-            return incident
-    return None
+    with _db_lock:
+        incidents = load_incidents()
+        position = _cache["index"].get(incident_id)
+        # Callers modify the result, so never hand out the cached dict
+        return copy.deepcopy(incidents[position]) if position is not None else None
 
 
 def update_incident(incident_id: int, updates: dict) -> Optional[dict]:
     """Update an incident."""
-    incidents = load_incidents()
-    for i, incident in enumerate(incidents):
-        if incident["id"] == incident_id:
-            incidents[i].update(updates)
-            incidents[i]["updated_at"] = datetime.now().isoformat()
-            save_incidents(incidents)
-            return incidents[i]
-    return None
+    with _db_lock:
+        incident = get_incident(incident_id)
+        if not incident:
+            return None
+
+        incident.update(updates)
+        incident["updated_at"] = datetime.now().isoformat()
+        _fill_defaults(incident)
+
+        if "logs" in updates:
+            _cache["tokens"][incident_id] = log_token_counts(incident["logs"])
+
+        conn = _connect()
+        with conn:
+            row = _to_row(incident, _cache["tokens"][incident_id])
+            conn.execute(_UPDATE, row[1:] + (incident_id,))
+
+        _cache["data"][_cache["index"][incident_id]] = copy.deepcopy(incident)
+        invalidate_similarity_index()
+        return incident
 
 
 def add_attempted_fix(incident_id: int, fix: str) -> Optional[dict]:
     """Add an attempted fix to an incident."""
-    incident = get_incident(incident_id)
-    if not incident:
-        return None
-
-    attempted_fixes = incident.get("attempted_fixes", [])
-    attempted_fixes.append({
-        "fix": fix,
-        "applied_at": datetime.now().isoformat()
-    })
+    with _db_lock:
+        incident = get_incident(incident_id)
+        if not incident:
+            return None
 
-    return update_incident(incident_id, {"attempted_fixes": attempted_fixes})
+        attempted_fixes = incident.get("attempted_fixes", [])
+        attempted_fixes.append({
+            "fix": fix,
+            "applied_at": datetime.now().isoformat()
+        })
+
+        return update_incident(incident_id, {"attempted_fixes": attempted_fixes})
 
 
 def resolve_incident(incident_id: int, resolution_notes: str = "") -> Optional[dict]:
@@ -113,3 +365,19 @@ def resolve_incident(incident_id: int, resolution_notes: str = "") -> Optional[d
         "status": "resolved",
         "resolution_notes": resolution_notes
     })
+
+
+def delete_incident(incident_id: int) -> bool:
+    """Delete an incident. Returns False if it did not exist."""
+    with _db_lock:
+        conn = _connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM incidents WHERE id = ?", (incident_id,))
+
+        position = _cache["index"].get(incident_id) if _cache["data"] is not None else None
+        if position is not None:
+            del _cache["data"][position]
+            del _cache["tokens"][incident_id]
+            _reindex_cache()
+            invalidate_similarity_index()
+    return cursor.rowcount > 0
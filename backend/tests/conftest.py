@@ -0,0 +1,28 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import memory  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Run against a fresh database seeded from the repo's incidents.json."""
+    shutil.copy(os.path.join(BACKEND_DIR, memory.MEMORY_FILE), tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    def reset():
+        if memory._connection is not None:
+            memory._connection.close()
+        memory._connection = None
+        memory._cache.update({"version": None, "data": None, "index": None, "tokens": None})
+        memory.invalidate_similarity_index()
+
+    reset()
+    yield tmp_path
+    reset()
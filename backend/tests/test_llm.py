@@ -0,0 +1,62 @@
+import importlib
+import random
+import re
+import sys
+
+import pytest
+
+import llm
+
+# extract_error_keywords before the single-pass rewrite: one search per
+# signature over the lowercased logs
+BASELINE_PATTERNS = [
+    ('oom', r'oomkilled|out of memory'),
+    ('econn', r'econnrefused|connection refused'),
+    ('timeout', r'timeout'),
+    ('permission', r'permission denied|403|401'),
+    ('crash', r'crash|segfault'),
+    ('disk', r'disk|storage|no space'),
+    ('crashloop', r'crashloopbackoff'),
+    ('imagepull', r'imagepullbackoff'),
+]
+
+FRAGMENTS = [
+    "timeout", "out of memory", "OOMKilled", "CrashLoopBackOff", "CRASH", "disk",
+    "no space", "403", "40", "1", "connection refused", "ECONNREFUSED",
+    "imagepullbackoff", "segfault", "permission denied", "storage", "of memory",
+    "time", " ", "x", "é",
+]
+
+
+def baseline_signatures(logs):
+    logs_lower = logs.lower()
+    return {name for name, pattern in BASELINE_PATTERNS if re.search(pattern, logs_lower)}
+
+
+@pytest.fixture(params=["re2", "re"])
+def engine(request, monkeypatch):
+    """Reload llm with RE2 or with the re fallback."""
+    if request.param == "re2":
+        pytest.importorskip("re2")
+    else:
+        monkeypatch.setitem(sys.modules, "re2", None)
+    yield importlib.reload(llm)
+    monkeypatch.undo()
+    importlib.reload(llm)
+
+
+@pytest.mark.parametrize("logs, expected", [
+    ("upstream timeout of memory", {"timeout", "oom"}),
+    ("CrashLoopBackOff", {"crash", "crashloop"}),
+    ("10:00:00.403Z", {"permission"}),
+    ("out\nof memory", set()),
+])
+def test_overlapping_signatures(engine, logs, expected):
+    assert engine.match_error_signatures(logs) == expected
+
+
+def test_matches_baseline_patterns(engine):
+    rng = random.Random(0)
+    for _ in range(20000):
+        logs = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 8)))
+        assert engine.match_error_signatures(logs) == baseline_signatures(logs), logs
@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import llm
+import main
+
+
+def test_search_semaphore_survives_app_restart(store, monkeypatch):
+    async def slow_search(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"results": {"web": [{"url": request.url.params["query"]}]}})
+
+    open_http_client = llm.open_http_client
+
+    def mocked_client():
+        client = open_http_client()
+        client._transport = httpx.MockTransport(slow_search)
+        return client
+
+    monkeypatch.setattr(llm, "YOU_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "open_http_client", mocked_client)
+    monkeypatch.setattr(llm, "_search_cache", llm.OrderedDict())
+
+    # Each lifespan runs on a new event loop; contend for the semaphore in both
+    for run in range(2):
+        queries = [f"run{run}-{i}" for i in range(2 * llm._SEARCH_CONCURRENCY)]
+        with TestClient(main.app) as client:
+            async def search_all():
+                return await asyncio.gather(*(llm.search_you_com(q) for q in queries))
+
+            results = client.portal.call(search_all)
+
+        assert [r["results"]["web"][0]["url"] for r in results] == queries
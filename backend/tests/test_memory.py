@@ -0,0 +1,72 @@
+import sqlite3
+
+import memory
+
+V1_SCHEMA = """
+CREATE TABLE incidents (
+    id INTEGER PRIMARY KEY,
+    logs TEXT NOT NULL,
+    metrics TEXT NOT NULL DEFAULT '',
+    suspected_root_causes TEXT NOT NULL DEFAULT '[]',
+    attempted_fixes TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'open',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    resolution_notes TEXT NOT NULL DEFAULT ''
+)
+"""
+
+
+def test_seeds_new_database(store):
+    incidents = memory.load_incidents()
+    assert [i["id"] for i in incidents] == [1, 2, 3, 4, 5, 6]
+    assert "token_counts" not in incidents[0]
+
+    conn = sqlite3.connect(memory.DATABASE_FILE)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+
+
+def test_upgrades_v1_database(store):
+    conn = sqlite3.connect(memory.DATABASE_FILE)
+    conn.execute(V1_SCHEMA)
+    conn.execute(
+        "INSERT INTO incidents (id, logs, status, created_at, updated_at, resolution_notes) "
+        "VALUES (1, '[ERROR] OOMKilled api', 'resolved', 't', 't', 'raised limit')"
+    )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    # The seed file is only for new databases
+    assert [i["id"] for i in memory.load_incidents()] == [1]
+    assert [i["id"] for i in memory.find_similar_incidents("OOMKilled")] == [1]
+
+    conn = sqlite3.connect(memory.DATABASE_FILE)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    token_counts = conn.execute("SELECT token_counts FROM incidents").fetchone()[0]
+    assert '"oomkilled":1' in token_counts
+
+
+def test_reloads_after_another_connection_commits(store):
+    assert [i["id"] for i in memory.find_similar_incidents("OOMKilled")] == [1]
+
+    conn = sqlite3.connect(memory.DATABASE_FILE)
+    conn.execute("UPDATE incidents SET status = 'open' WHERE id = 1")
+    conn.commit()
+
+    assert memory.get_incident(1)["status"] == "open"
+    assert memory.find_similar_incidents("OOMKilled") == []
+
+
+def test_null_text_fields_stored_as_empty(store):
+    incident = memory.create_incident("pod timeout", None)
+    memory.resolve_incident(incident["id"], None)
+
+    cached = memory.get_incident(incident["id"])
+    assert cached["metrics"] == ""
+    assert cached["resolution_notes"] == ""
+
+    row = sqlite3.connect(memory.DATABASE_FILE).execute(
+        "SELECT metrics, resolution_notes FROM incidents WHERE id = ?", (incident["id"],)
+    ).fetchone()
+    assert row == ("", "")